@@ -1,37 +1,63 @@
-from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
-from flask_cors import CORS
-import requests
+from quart import Quart, render_template, request, jsonify, Response
+from quart.json.provider import JSONProvider
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException
+import aiohttp
+import asyncio
+import av
+import contextlib
+import functools
+import inspect
+import redis.asyncio as redis
+from cachetools import TTLCache
 from datetime import datetime
+import io
+import logging
+import orjson
 import os
-import glob
-import tempfile
+import random
+import re
 import time
+import wave
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Clear any CA bundle env vars so they don't affect third-party API calls (ElevenLabs etc.)
-# Revinci uses a self-signed cert so its calls explicitly pass verify=False
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-os.environ.pop('REQUESTS_CA_BUNDLE', None)
-os.environ.pop('CURL_CA_BUNDLE', None)
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Revinci uses a self-signed cert so its dedicated session disables verification
 REVINCI_SSL_VERIFY = False  # Revinci dev server uses self-signed cert
 
-import subprocess
 
-# Ensure ffmpeg is on PATH (required for audio conversion)
-_ffmpeg_search = glob.glob(
-    os.path.expandvars(r'%LOCALAPPDATA%\Microsoft\WinGet\Packages\*FFmpeg*\**\bin'),
-    recursive=True
-)
-for p in _ffmpeg_search:
-    if os.path.isdir(p) and p not in os.environ.get('PATH', ''):
-        os.environ['PATH'] = p + os.pathsep + os.environ.get('PATH', '')
-        print(f"[startup] Added ffmpeg to PATH: {p}")
+class ORJSONProvider(JSONProvider):
+    """jsonify() and request.get_json() through orjson instead of the stdlib."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
 
-app = Flask(__name__)
-CORS(app)
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # orjson already produces bytes, so skip the str round-trip in dumps()
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
+app = Quart(__name__)
+app.json = ORJSONProvider(app)
+# Largest accepted request bodies; JSON endpoints carry a message, not a file
+REQUEST_LIMITS = {
+    'json_body': 64 * 1024,
+    'upload': 10 * 1024 * 1024  # recorded STT audio
+}
+# Quart rejects anything larger with a 413 before reading the body
+app.config['MAX_CONTENT_LENGTH'] = REQUEST_LIMITS['upload']
+app = cors(app)
 
 # Configuration (all secrets loaded from .env)
 AZURE_CONFIG = {
@@ -72,15 +98,29 @@ REVINCI_CONFIG = {
     'keycloak_client_id': os.getenv('KEYCLOAK_CLIENT_ID', 'tessla'),
     'auth_username': os.getenv('REVINCI_AUTH_USERNAME', ''),
     'auth_password': os.getenv('REVINCI_AUTH_PASSWORD', ''),
+    # Seconds before the real expiry at which a cached token is treated as stale
+    'token_refresh_skew': 60,
+    # After a failed token fetch, fail fast for this long instead of retrying Keycloak
+    'token_failure_backoff': 30,
 }
 
-# Token cache: {'token': str, 'expires_at': float (unix timestamp)}
-_revinci_token_cache = {'token': '', 'expires_at': 0.0}
+# Sent with every chat call; only Authorization varies. Not set on the session
+# because the Keycloak token request shares it and posts a form body.
+_REVINCI_BASE_HEADERS = {
+    'Content-Type': 'application/json',
+    'tenant-id': 'tessla'
+}
+
+# Token cache: {'token': str, 'expires_at': float, 'retry_at': float (unix timestamps)}
+_revinci_token_cache = {'token': '', 'expires_at': 0.0, 'retry_at': 0.0}
+# Serializes token refreshes so concurrent requests share a single fetch
+_revinci_token_lock = asyncio.Lock()
 
 # ElevenLabs Configuration
 ELEVENLABS_CONFIG = {
     'api_key': os.getenv('ELEVENLABS_API_KEY', ''),
-    'base_url': 'https://api.elevenlabs.io/v1'
+    'base_url': 'https://api.elevenlabs.io/v1',
+    'voices_ttl': 3600  # the voice catalog rarely changes
 }
 
 # ElevenLabs Voice IDs (popular voices)
@@ -100,8 +140,35 @@ ELEVENLABS_VOICES = {
     'other': []
 }
 
-conversation_sessions = {}
-revinci_conversation_ids = {}  # session_id -> revinci conversation_id
+# Voice catalog cache: {'voices': dict | None, 'expires_at': float (unix timestamp)}
+_voices_cache = {'voices': None, 'expires_at': 0.0}
+# Serializes catalog refreshes so concurrent page loads share a single fetch
+_voices_lock = asyncio.Lock()
+
+# Shared outbound HTTP session, opened/closed with the server lifecycle
+_http_session = None
+# Revinci gets its own session: it needs ssl=False, and its long chat calls
+# should not hold slots in the shared pool
+_revinci_session = None
+
+# Redis client for the response cache and session store (None when REDIS_URL is unset)
+_redis = None
+
+# Per-provider caps on in-flight requests, kept under each API's rate limits
+_news_sem = asyncio.Semaphore(10)
+_weather_sem = asyncio.Semaphore(20)
+_wiki_sem = asyncio.Semaphore(5)
+_elevenlabs_sem = asyncio.Semaphore(8)
+
+# Per-session state, bounded in size and expired after a period of inactivity
+SESSION_CONFIG = {
+    'max_sessions': 10000,
+    'ttl': 3600
+}
+
+conversation_sessions = TTLCache(maxsize=SESSION_CONFIG['max_sessions'], ttl=SESSION_CONFIG['ttl'])
+# session_id -> revinci conversation_id; Redis is used instead when configured
+revinci_conversation_ids = TTLCache(maxsize=SESSION_CONFIG['max_sessions'], ttl=SESSION_CONFIG['ttl'])
 
 # Azure Speech-to-Text configuration
 AZURE_SPEECH_CONFIG = {
@@ -109,6 +176,42 @@ AZURE_SPEECH_CONFIG = {
     'region':  os.getenv('AZURE_SPEECH_REGION', 'westus'),
 }
 
+# Backoff for transient upstream failures (429/5xx and dropped connections)
+RETRY_CONFIG = {
+    'attempts': 4,
+    'base_delay': 0.25,
+    # A Retry-After longer than this is not worth making the user wait for
+    'max_delay': 4.0,
+    'statuses': frozenset([429, 500, 502, 503, 504]),
+    # The only status that guarantees the upstream did no (billable) work;
+    # the rest of 'statuses' may arrive after it already did
+    'rejected_statuses': frozenset([429])
+}
+
+# Upstream response cache (Redis, run with maxmemory-policy allkeys-lfu)
+CACHE_CONFIG = {
+    'redis_url': os.getenv('REDIS_URL', ''),
+    # Entries kept in process memory when Redis is not configured
+    'local_maxsize': 1024,
+    # Entries outlive their TTL by this long so they can be served if the upstream fails
+    'stale_grace': 3600,
+    'ttl': {
+        'weather': 300,
+        'forecast': 1800,
+        'wikipedia': 86400,
+        'headlines': 120,
+        'news_query': 300,
+    }
+}
+
+# In-process fallback for the response cache. The cache-wide TTL only evicts
+# entries eventually; _cache_get expires each one stale_grace after its own
+# stale_at, matching the per-key EXPIRE on Redis
+_local_cache = TTLCache(
+    maxsize=CACHE_CONFIG['local_maxsize'],
+    ttl=max(CACHE_CONFIG['ttl'].values()) + CACHE_CONFIG['stale_grace'],
+)
+
 SYSTEM_PROMPT = """You are a helpful AI assistant with access to real-time weather information, Wikipedia knowledge, and news articles. 
 
 When users ask about weather, you can provide current conditions, forecasts, and weather-related advice.
@@ -120,7 +223,201 @@ When users ask about news, you can provide latest headlines, breaking news, and
 Always provide natural, conversational responses based on the data available."""
 
 
-def get_weather_data(city):
+@app.before_serving
+async def open_http_session():
+    global _http_session, _revinci_session
+    # Keep idle connections (and their TLS sessions) around between conversation
+    # turns instead of aiohttp's 15s default, and cache DNS lookups per host.
+    _http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=200,
+            limit_per_host=64,
+            keepalive_timeout=75,
+            ttl_dns_cache=300
+        ),
+        timeout=aiohttp.ClientTimeout(total=10),
+        json_serialize=lambda obj: orjson.dumps(obj).decode()
+    )
+    _revinci_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=100,
+            keepalive_timeout=75,
+            ttl_dns_cache=300,
+            ssl=REVINCI_SSL_VERIFY
+        ),
+        timeout=aiohttp.ClientTimeout(total=30),
+        json_serialize=lambda obj: orjson.dumps(obj).decode()
+    )
+
+
+@app.after_serving
+async def close_http_session():
+    if _http_session:
+        await _http_session.close()
+    if _revinci_session:
+        await _revinci_session.close()
+
+
+def retry_delay(attempt, retry_after=None):
+    """Exponential backoff with jitter, honouring a numeric Retry-After header."""
+    delay = RETRY_CONFIG['base_delay'] * 2 ** attempt
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            pass  # HTTP-date form; fall back to our own schedule
+    return delay + random.uniform(0, 0.1)
+
+
+async def send_with_retry(session, method, url, idempotent=True, **kwargs):
+    """Send a request, retrying transient failures.
+
+    Non-idempotent requests are only retried when the upstream cannot have acted
+    on them: a rejected status (429) or a connection that was never established.
+    """
+    attempts = RETRY_CONFIG['attempts']
+    statuses = RETRY_CONFIG['statuses'] if idempotent else RETRY_CONFIG['rejected_statuses']
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        try:
+            response = await session.request(method, url, **kwargs)
+        except aiohttp.ClientConnectionError as e:
+            # Timeouts already cost the full budget; retrying would only multiply it
+            if last_attempt or isinstance(e, asyncio.TimeoutError):
+                raise
+            # A dropped connection may have happened after the request was processed
+            if not idempotent and not isinstance(e, aiohttp.ClientConnectorError):
+                raise
+            await asyncio.sleep(retry_delay(attempt))
+            continue
+
+        if response.status not in statuses or last_attempt:
+            return response
+        delay = retry_delay(attempt, response.headers.get('Retry-After'))
+        if delay > RETRY_CONFIG['max_delay']:
+            return response
+        logger.warning("[Upstream] %s from %s, retrying in %.2fs", response.status, response.url.host, delay)
+        response.release()
+        await asyncio.sleep(delay)
+
+
+@contextlib.asynccontextmanager
+async def upstream_request(semaphore, method, url, idempotent=True, **kwargs):
+    """Issue a request on the shared session while holding the provider's semaphore,
+    retrying transient failures with backoff."""
+    async with semaphore:
+        response = await send_with_retry(_http_session, method, url, idempotent, **kwargs)
+        async with response:
+            yield response
+
+
+class ClosingStream:
+    """Async iterator over ``chunks`` that closes ``stack`` once the body is
+    exhausted or the server drops the response, even before the first chunk."""
+
+    def __init__(self, chunks, stack):
+        self._chunks = chunks
+        self._stack = stack
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        await self._stack.aclose()
+
+
+@app.before_serving
+async def open_cache():
+    global _redis
+    if CACHE_CONFIG['redis_url']:
+        _redis = redis.from_url(CACHE_CONFIG['redis_url'], decode_responses=True)
+
+
+@app.after_serving
+async def close_cache():
+    if _redis:
+        await _redis.aclose()
+
+
+async def _cache_get(key):
+    if _redis is None:
+        entry = _local_cache.get(key)
+        if entry and entry['stale_at'] + CACHE_CONFIG['stale_grace'] < time.time():
+            del _local_cache[key]
+            return None
+        return entry
+    try:
+        entry = await _redis.hgetall(key)
+    except redis.RedisError as e:
+        logger.warning("[Cache] GET %s failed: %s", key, e)
+        return None
+    if not entry:
+        return None
+    return {'body': orjson.loads(entry['body']), 'stale_at': float(entry['stale_at'])}
+
+
+async def _cache_set(key, body, ttl):
+    if _redis is None:
+        _local_cache[key] = {'body': body, 'stale_at': time.time() + ttl}
+        return
+    try:
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={'body': orjson.dumps(body), 'stale_at': time.time() + ttl})
+            pipe.expire(key, ttl + CACHE_CONFIG['stale_grace'])
+            await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("[Cache] SET %s failed: %s", key, e)
+
+
+def cached(policy):
+    """Cache a helper's successful results in Redis, or in process memory
+    when REDIS_URL is unset.
+
+    ``policy`` receives the helper's bound arguments and returns ``(key, ttl)``.
+    If the upstream call fails, the last cached value is returned even when stale,
+    marked with ``'stale': True``.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key, ttl = policy(**bound.arguments)
+
+            entry = await _cache_get(key)
+            if entry and entry['stale_at'] > time.time():
+                return entry['body']
+
+            result = await fn(*args, **kwargs)
+            if result['success']:
+                await _cache_set(key, result, ttl)
+            elif entry:
+                return {**entry['body'], 'stale': True}
+            return result
+        return wrapper
+    return decorator
+
+
+def cacheable(response, ttl, stale=False):
+    """Let browsers and shared caches reuse ``response`` for ``ttl`` seconds.
+
+    A stale fallback is already past its TTL, so clients must revalidate it.
+    """
+    response.headers['Cache-Control'] = 'no-cache' if stale else f"public, max-age={ttl}"
+    return response
+
+
+@cached(lambda city: (f"wx:{city.lower()}", CACHE_CONFIG['ttl']['weather']))
+async def get_weather_data(city):
     try:
         if not WEATHER_CONFIG['api_key']:
             return {'success': False, 'error': 'Weather API key not configured'}
@@ -132,10 +429,11 @@ def get_weather_data(city):
             'units': 'metric'
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        async with upstream_request(_weather_sem, 'GET', url, params=params) as response:
+            status = response.status
+            data = await response.json(loads=orjson.loads) if status == 200 else None
         
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             weather_info = {
                 'city': data['name'],
                 'country': data['sys']['country'],
@@ -151,27 +449,28 @@ def get_weather_data(city):
                 'wind_deg': data['wind'].get('deg', 0),
                 'clouds': data['clouds']['all'],
                 'visibility': data.get('visibility', 'N/A'),
-                'sunrise': datetime.fromtimestamp(data['sys']['sunrise']).strftime('%H:%M:%S'),
-                'sunset': datetime.fromtimestamp(data['sys']['sunset']).strftime('%H:%M:%S'),
-                'timestamp': datetime.fromtimestamp(data['dt']).strftime('%Y-%m-%d %H:%M:%S')
+                'sunrise': time.strftime('%H:%M:%S', time.localtime(data['sys']['sunrise'])),
+                'sunset': time.strftime('%H:%M:%S', time.localtime(data['sys']['sunset'])),
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['dt']))
             }
             return {'success': True, 'data': weather_info}
-        elif response.status_code == 404:
+        elif status == 404:
             return {'success': False, 'error': f'City "{city}" not found'}
-        elif response.status_code == 401:
+        elif status == 401:
             return {'success': False, 'error': 'Invalid API key'}
         else:
             return {'success': False, 'error': 'Unable to fetch weather data'}
             
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         return {'success': False, 'error': 'Weather service timeout'}
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         return {'success': False, 'error': 'Unable to connect to weather service'}
     except Exception as e:
         return {'success': False, 'error': f'Weather API error: {str(e)}'}
 
 
-def get_weather_forecast(city, days=5):
+@cached(lambda city, days: (f"fc:{city.lower()}:{days}", CACHE_CONFIG['ttl']['forecast']))
+async def get_weather_forecast(city, days=5):
     try:
         if not WEATHER_CONFIG['api_key']:
             return {'success': False, 'error': 'Weather API key not configured'}
@@ -184,16 +483,18 @@ def get_weather_forecast(city, days=5):
             'cnt': min(days * 8, 40)
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        async with upstream_request(_weather_sem, 'GET', url, params=params) as response:
+            status = response.status
+            data = await response.json(loads=orjson.loads) if status == 200 else None
         
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             forecast_list = []
             
             for item in data['list'][::8][:days]:
+                local_time = time.localtime(item['dt'])
                 forecast_list.append({
-                    'date': datetime.fromtimestamp(item['dt']).strftime('%Y-%m-%d'),
-                    'day': datetime.fromtimestamp(item['dt']).strftime('%A'),
+                    'date': time.strftime('%Y-%m-%d', local_time),
+                    'day': time.strftime('%A', local_time),
                     'temperature': item['main']['temp'],
                     'temp_min': item['main']['temp_min'],
                     'temp_max': item['main']['temp_max'],
@@ -211,89 +512,83 @@ def get_weather_forecast(city, days=5):
         return {'success': False, 'error': f'Forecast API error: {str(e)}'}
 
 
-def detect_weather_query(message):
-    message_lower = message.lower()
-    weather_keywords = [
-        'weather', 'temperature', 'forecast', 'rain', 'raining', 'rainy',
-        'sunny', 'cloudy', 'humidity', 'humid', 'wind', 'windy', 'climate',
-        'hot', 'cold', 'warm', 'cool', 'snow', 'snowing', 'storm', 'stormy',
-        'celsius', 'fahrenheit', 'degrees', 'umbrella', 'jacket'
-    ]
-    
-    is_weather_query = any(keyword in message_lower for keyword in weather_keywords)
-    
-    if not is_weather_query:
+_WEATHER_KEYWORDS = [
+    'weather', 'temperature', 'forecast', 'rain', 'raining', 'rainy',
+    'sunny', 'cloudy', 'humidity', 'humid', 'wind', 'windy', 'climate',
+    'hot', 'cold', 'warm', 'cool', 'snow', 'snowing', 'storm', 'stormy',
+    'celsius', 'fahrenheit', 'degrees', 'umbrella', 'jacket'
+]
+# Whole words only ('photo' is not 'hot', 'train' is not 'rain'), but inflections
+# ('temperatures', 'colder', 'snowy', 'rainfall') and storm compounds still count
+_WEATHER_RE = re.compile(
+    r'\b(?:(?:thunder|rain|snow|hail|wind|sand|dust|ice)storm|' + '|'.join(_WEATHER_KEYWORDS) + r')'
+    r'(?:s|y|er|est|ier|iest|ter|test|ing|ed|fall)?\b'
+)
+# A standalone preposition followed by up to three candidate city words
+_CITY_RE = re.compile(r'(?<!\S)(?:in|at|for|of)\s+(?=(\S+(?:\s+\S+){0,2}))', re.IGNORECASE)
+_CITY_STOP_WORDS = frozenset(['the', 'weather', 'forecast', 'today', 'tomorrow', 'like'])
+
+
+@functools.lru_cache(maxsize=2048)
+def _detect_weather_impl(message):
+    if not _WEATHER_RE.search(message.lower()):
         return {'is_weather': False}
     
-    words = message.split()
-    for i, word in enumerate(words):
-        if word.lower() in ['in', 'at', 'for', 'of'] and i + 1 < len(words):
-            city_parts = []
-            for j in range(i + 1, min(i + 4, len(words))):
-                word_clean = words[j].rstrip('?,!.')
-                if word_clean.lower() not in ['the', 'weather', 'forecast', 'today', 'tomorrow', 'like']:
-                    city_parts.append(word_clean)
-                else:
-                    break
-            
-            if city_parts:
-                return {'is_weather': True, 'city': ' '.join(city_parts)}
+    for match in _CITY_RE.finditer(message):
+        city_parts = []
+        for word in match.group(1).split():
+            word_clean = word.rstrip('?,!.')
+            if word_clean.lower() in _CITY_STOP_WORDS:
+                break
+            city_parts.append(word_clean)
+        
+        if city_parts:
+            return {'is_weather': True, 'city': ' '.join(city_parts)}
     
     return {'is_weather': True, 'city': None}
 
 
-def search_wikipedia(query, sentences=3):
+def detect_weather_query(message):
+    # Not lowercased: the extracted city keeps the user's casing
+    return dict(_detect_weather_impl(message.strip()))
+
+
+@cached(lambda query, sentences: (f"wiki:{query.lower()}:{sentences}", CACHE_CONFIG['ttl']['wikipedia']))
+async def search_wikipedia(query, sentences=3):
     try:
-        search_params = {
+        # generator=search resolves the best match and returns its extract in one round-trip
+        params = {
             'action': 'query',
-            'list': 'search',
-            'srsearch': query,
-            'format': 'json',
-            'srlimit': 1
+            'generator': 'search',
+            'gsrsearch': query,
+            'gsrlimit': 1,
+            'prop': 'extracts|info',
+            'exintro': 1,
+            'explaintext': 1,
+            'exsentences': sentences,
+            'inprop': 'url',
+            'format': 'json'
         }
         
         headers = {'User-Agent': WIKIPEDIA_CONFIG['user_agent']}
         
-        search_response = requests.get(
+        async with upstream_request(
+            _wiki_sem,
+            'GET',
             WIKIPEDIA_CONFIG['base_url'], 
-            params=search_params, 
-            headers=headers,
-            timeout=10
-        )
-        
-        if search_response.status_code != 200:
-            return {'success': False, 'error': 'Wikipedia search failed'}
+            params=params, 
+            headers=headers
+        ) as response:
+            if response.status != 200:
+                return {'success': False, 'error': 'Wikipedia search failed'}
+            
+            data = await response.json(loads=orjson.loads)
         
-        search_data = search_response.json()
+        pages = data.get('query', {}).get('pages')
         
-        if not search_data['query']['search']:
+        if not pages:
             return {'success': False, 'error': f'No Wikipedia article found for "{query}"'}
         
-        page_title = search_data['query']['search'][0]['title']
-        
-        content_params = {
-            'action': 'query',
-            'prop': 'extracts|info',
-            'exintro': True,
-            'explaintext': True,
-            'exsentences': sentences,
-            'titles': page_title,
-            'format': 'json',
-            'inprop': 'url'
-        }
-        
-        content_response = requests.get(
-            WIKIPEDIA_CONFIG['base_url'],
-            params=content_params,
-            headers=headers,
-            timeout=10
-        )
-        
-        if content_response.status_code != 200:
-            return {'success': False, 'error': 'Failed to fetch Wikipedia content'}
-        
-        content_data = content_response.json()
-        pages = content_data['query']['pages']
         page_id = list(pages.keys())[0]
         
         if page_id == '-1':
@@ -310,40 +605,52 @@ def search_wikipedia(query, sentences=3):
         
         return {'success': True, 'data': wiki_data}
         
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         return {'success': False, 'error': 'Wikipedia request timeout'}
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         return {'success': False, 'error': 'Unable to connect to Wikipedia'}
     except Exception as e:
         return {'success': False, 'error': f'Wikipedia API error: {str(e)}'}
 
 
-def detect_wikipedia_query(message):
-    message_lower = message.lower()
-    wikipedia_triggers = [
-        'who is', 'who was', 'who are', 'what is', 'what was', 'what are',
-        'tell me about', 'information about', 'explain', 'define',
-        'wikipedia', 'wiki', 'search for', 'look up',
-        'history of', 'biography of', 'facts about'
-    ]
-    
-    is_wiki_query = any(trigger in message_lower for trigger in wikipedia_triggers)
+_WIKIPEDIA_TRIGGERS = [
+    'who is', 'who was', 'who are', 'what is', 'what was', 'what are',
+    'tell me about', 'information about', 'explain', 'define',
+    'wikipedia', 'wiki', 'search for', 'look up',
+    'history of', 'biography of', 'facts about'
+]
+# Longest alternatives first so e.g. 'wikipedia' wins over 'wiki'
+_WIKIPEDIA_RE = re.compile('|'.join(map(re.escape, sorted(_WIKIPEDIA_TRIGGERS, key=len, reverse=True))))
+# The query follows the trigger listed first, not the one leftmost in the message
+_WIKIPEDIA_PRIORITY = {trigger: i for i, trigger in enumerate(_WIKIPEDIA_TRIGGERS)}
+
+
+@functools.lru_cache(maxsize=2048)
+def _detect_wikipedia_impl(message_lower):
+    matches = list(_WIKIPEDIA_RE.finditer(message_lower))
     
-    if not is_wiki_query:
+    if not matches:
         return {'is_wikipedia': False}
     
-    for trigger in wikipedia_triggers:
-        if trigger in message_lower:
-            parts = message_lower.split(trigger, 1)
-            if len(parts) > 1:
-                search_query = parts[1].strip().rstrip('?.,!')
-                if search_query:
-                    return {'is_wikipedia': True, 'query': search_query}
+    for match in sorted(matches, key=lambda m: _WIKIPEDIA_PRIORITY[m.group()]):
+        search_query = message_lower[match.end():].strip().rstrip('?.,!')
+        if search_query:
+            return {'is_wikipedia': True, 'query': search_query}
     
     return {'is_wikipedia': True, 'query': None}
 
 
-def get_general_news(query=None, category=None, country='us', page_size=10):
+def detect_wikipedia_query(message):
+    return dict(_detect_wikipedia_impl(message.strip().lower()))
+
+
+# NewsAPI is only ever asked for NEWS_CONFIG['page_size'] articles, so larger
+# page sizes share one cache entry
+@cached(lambda query, category, country, page_size: (
+    f"news:{category}:{country}:{query}:{min(page_size, NEWS_CONFIG['page_size'])}",
+    CACHE_CONFIG['ttl']['news_query' if query else 'headlines']
+))
+async def get_general_news(query=None, category=None, country='us', page_size=10):
     try:
         if not NEWS_CONFIG['api_key']:
             return {'success': False, 'error': 'News API key not configured'}
@@ -368,13 +675,11 @@ def get_general_news(query=None, category=None, country='us', page_size=10):
             if category:
                 params['category'] = category
         
-        response = requests.get(url, params=params, timeout=10)
+        async with upstream_request(_news_sem, 'GET', url, params=params) as response:
+            data = await response.json(loads=orjson.loads)
         
-        if response.status_code != 200:
-            error_data = response.json()
-            return {'success': False, 'error': error_data.get('message', 'News API request failed')}
-        
-        data = response.json()
+        if response.status != 200:
+            return {'success': False, 'error': data.get('message', 'News API request failed')}
         
         if data['status'] != 'ok':
             return {'success': False, 'error': 'Failed to fetch news'}
@@ -404,15 +709,19 @@ def get_general_news(query=None, category=None, country='us', page_size=10):
             }
         }
         
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         return {'success': False, 'error': 'News API timeout'}
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         return {'success': False, 'error': 'Unable to connect to News API'}
     except Exception as e:
         return {'success': False, 'error': f'News API error: {str(e)}'}
 
 
-def get_financial_news(query=None, page_size=10):
+@cached(lambda query, page_size: (
+    f"finnews:{query}:{min(page_size, NEWS_CONFIG['page_size'])}",
+    CACHE_CONFIG['ttl']['news_query']
+))
+async def get_financial_news(query=None, page_size=10):
     try:
         if not NEWS_CONFIG['api_key']:
             return {'success': False, 'error': 'News API key not configured'}
@@ -438,13 +747,11 @@ def get_financial_news(query=None, page_size=10):
         if FINANCIAL_NEWS_CONFIG['sources']:
             params['domains'] = ','.join([f"{source}.com" for source in FINANCIAL_NEWS_CONFIG['sources']])
         
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code != 200:
-            error_data = response.json()
-            return {'success': False, 'error': error_data.get('message', 'Financial news API request failed')}
+        async with upstream_request(_news_sem, 'GET', url, params=params) as response:
+            data = await response.json(loads=orjson.loads)
         
-        data = response.json()
+        if response.status != 200:
+            return {'success': False, 'error': data.get('message', 'Financial news API request failed')}
         
         if data['status'] != 'ok':
             return {'success': False, 'error': 'Failed to fetch financial news'}
@@ -474,45 +781,51 @@ def get_financial_news(query=None, page_size=10):
             }
         }
         
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         return {'success': False, 'error': 'Financial news API timeout'}
     except Exception as e:
         return {'success': False, 'error': f'Financial news API error: {str(e)}'}
 
 
-def detect_news_query(message):
-    message_lower = message.lower()
-    
-    news_keywords = [
-        'news', 'headline', 'headlines', 'latest news', 'breaking news',
-        'current events', 'today news', 'recent news', 'news about',
-        'whats happening', "what's happening", 'tell me about news',
-        'any news', 'top news', 'trending news'
-    ]
-    
-    financial_keywords = [
-        'financial news', 'business news', 'market news', 'stock news',
-        'economy news', 'finance news', 'trading news', 'wall street'
-    ]
-    
-    is_news_query = any(keyword in message_lower for keyword in news_keywords)
-    is_financial = any(keyword in message_lower for keyword in financial_keywords)
+_NEWS_KEYWORDS = [
+    'news', 'headline', 'headlines', 'latest news', 'breaking news',
+    'current events', 'today news', 'recent news', 'news about',
+    'whats happening', "what's happening", 'tell me about news',
+    'any news', 'top news', 'trending news'
+]
+_FINANCIAL_NEWS_KEYWORDS = [
+    'financial news', 'business news', 'market news', 'stock news',
+    'economy news', 'finance news', 'trading news', 'wall street'
+]
+_NEWS_RE = re.compile('|'.join(map(re.escape, _NEWS_KEYWORDS)))
+_FINANCIAL_NEWS_RE = re.compile('|'.join(map(re.escape, _FINANCIAL_NEWS_KEYWORDS)))
+_NEWS_QUERY_RE = re.compile('|'.join(map(re.escape, sorted(
+    _NEWS_KEYWORDS + _FINANCIAL_NEWS_KEYWORDS, key=len, reverse=True
+))))
+_NEWS_QUERY_PRIORITY = {
+    keyword: i for i, keyword in enumerate(_NEWS_KEYWORDS + _FINANCIAL_NEWS_KEYWORDS)
+}
+_NEWS_QUERY_FILLERS = ('about', 'on', 'regarding', 'related to', '?', '.', '!')
+
+
+@functools.lru_cache(maxsize=2048)
+def _detect_news_impl(message_lower):
+    is_news_query = bool(_NEWS_RE.search(message_lower))
+    is_financial = bool(_FINANCIAL_NEWS_RE.search(message_lower))
     
     if not is_news_query and not is_financial:
         return {'is_news': False}
     
     query = None
-    for keyword in news_keywords + financial_keywords:
-        if keyword in message_lower:
-            parts = message_lower.split(keyword, 1)
-            if len(parts) > 1:
-                potential_query = parts[1].strip()
-                for word in ['about', 'on', 'regarding', 'related to', '?', '.', '!']:
-                    potential_query = potential_query.replace(word, '').strip()
-                
-                if potential_query:
-                    query = potential_query
-                    break
+    matches = _NEWS_QUERY_RE.finditer(message_lower)
+    for match in sorted(matches, key=lambda m: _NEWS_QUERY_PRIORITY[m.group()]):
+        potential_query = message_lower[match.end():].strip()
+        for word in _NEWS_QUERY_FILLERS:
+            potential_query = potential_query.replace(word, '').strip()
+        
+        if potential_query:
+            query = potential_query
+            break
     
     return {
         'is_news': True,
@@ -521,6 +834,10 @@ def detect_news_query(message):
     }
 
 
+def detect_news_query(message):
+    return dict(_detect_news_impl(message.strip().lower()))
+
+
 def format_weather_for_ai(weather_data):
     if not weather_data['success']:
         return f"[Weather information unavailable: {weather_data['error']}]"
@@ -570,52 +887,85 @@ def format_news_for_ai(news_data):
     articles = data['articles']
     news_type = data.get('type', 'general')
     
-    formatted = f"\n[Latest News Articles"
+    parts = ["\n[Latest News Articles"]
     if data.get('query'):
-        formatted += f" about '{data['query']}'"
-    formatted += f" - {news_type.capitalize()}]:\n\n"
+        parts.append(f" about '{data['query']}'")
+    parts.append(f" - {news_type.capitalize()}]:\n\n")
     
     for i, article in enumerate(articles[:5], 1):
-        formatted += f"{i}. {article['title']}\n"
-        formatted += f"   Source: {article['source']}"
+        parts.append(f"{i}. {article['title']}\n")
+        parts.append(f"   Source: {article['source']}")
         
         if article['published_at']:
             try:
                 pub_date = datetime.fromisoformat(article['published_at'].replace('Z', '+00:00'))
-                formatted += f" | {pub_date.strftime('%B %d, %Y')}"
+                parts.append(f" | {pub_date.strftime('%B %d, %Y')}")
             except:
                 pass
         
-        formatted += f"\n"
+        parts.append("\n")
         
         if article['description'] and article['description'] != 'No description':
-            formatted += f"   {article['description'][:200]}...\n"
+            parts.append(f"   {article['description'][:200]}...\n")
         
-        formatted += f"   URL: {article['url']}\n\n"
+        parts.append(f"   URL: {article['url']}\n\n")
     
-    formatted += f"Total articles found: {data['total_results']}\n\n"
-    formatted += "Please provide a natural summary of these news articles.\n"
+    parts.append(f"Total articles found: {data['total_results']}\n\n")
+    parts.append("Please provide a natural summary of these news articles.\n")
     
-    return formatted
+    return ''.join(parts)
+
+
+def json_body_too_large():
+    """Check the declared Content-Length before any of the body is read or parsed."""
+    return (request.content_length or 0) > REQUEST_LIMITS['json_body']
+
+
+@app.errorhandler(Exception)
+async def handle_error(e):
+    """JSON error responses for every route; anything unexpected is logged once here."""
+    if isinstance(e, HTTPException):
+        response = jsonify({'error': e.description})
+        # Keep what the exception adds, e.g. Allow on a 405
+        for name, value in e.get_headers():
+            if name.lower() not in ('content-type', 'content-length'):
+                response.headers.add(name, value)
+        return response, e.code
+    logger.exception("Unhandled error: %s", e)
+    return jsonify({'error': 'Internal server error'}), 500
 
 
 @app.route('/')
-def index():
-    return render_template('index.html')
+async def index():
+    return await render_template('index.html')
 
 
-@app.route('/api/voices', methods=['GET'])
-def get_voices():
-    """Return available ElevenLabs voices"""
-    try:
-        # Try to fetch voices from ElevenLabs API
-        headers = {
-            'xi-api-key': ELEVENLABS_CONFIG['api_key']
-        }
-        response = requests.get(f"{ELEVENLABS_CONFIG['base_url']}/voices", headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
+async def load_voices():
+    """Return the organized ElevenLabs voice catalog, refreshing the cache when stale.
+
+    Returns None if the catalog could not be fetched.
+    """
+    if _voices_cache['voices'] and _voices_cache['expires_at'] > time.time():
+        return _voices_cache['voices']
+
+    async with _voices_lock:
+        # Another request may have refreshed the catalog while we waited for the lock
+        if _voices_cache['voices'] and _voices_cache['expires_at'] > time.time():
+            return _voices_cache['voices']
+
+        try:
+            # Try to fetch voices from ElevenLabs API
+            headers = {
+                'xi-api-key': ELEVENLABS_CONFIG['api_key']
+            }
+            async with upstream_request(_elevenlabs_sem, 'GET', f"{ELEVENLABS_CONFIG['base_url']}/voices",
+                                        headers=headers) as response:
+                status = response.status
+                data = await response.json(loads=orjson.loads) if status == 200 else None
+            
+            if status != 200:
+                return None
+            
             # Organize voices by category
             organized_voices = {
                 'female': [],
@@ -641,21 +991,40 @@ def get_voices():
                 else:
                     organized_voices['other'].append(voice_info)
             
-            return jsonify(organized_voices)
-        else:
-            # Fallback to predefined voices
-            return jsonify(ELEVENLABS_VOICES)
-    except Exception as e:
-        print(f"Error fetching ElevenLabs voices: {str(e)}")
-        # Return predefined voices as fallback
+            _voices_cache['voices'] = organized_voices
+            _voices_cache['expires_at'] = time.time() + ELEVENLABS_CONFIG['voices_ttl']
+            return organized_voices
+        except Exception as e:
+            logger.error("Error fetching ElevenLabs voices: %s", e)
+            return None
+
+
+@app.before_serving
+async def warm_elevenlabs():
+    """Prefetch the voice catalog in the background. The first page load is then
+    served from cache, and the first TTS call reuses an already-open TLS connection."""
+    if ELEVENLABS_CONFIG['api_key']:
+        app.add_background_task(load_voices)
+
+
+@app.route('/api/voices', methods=['GET'])
+async def get_voices():
+    """Return available ElevenLabs voices"""
+    voices = await load_voices()
+    if voices is None:
+        # Fallback to predefined voices (not cached, so the next load retries)
         return jsonify(ELEVENLABS_VOICES)
 
+    return cacheable(jsonify(voices), ELEVENLABS_CONFIG['voices_ttl'])
+
 
 @app.route('/api/tts', methods=['POST'])
-def text_to_speech():
+async def text_to_speech():
     """Stream TTS audio directly from ElevenLabs to reduce latency"""
     try:
-        data = request.json
+        if json_body_too_large():
+            return jsonify({'error': 'Request body too large'}), 413
+        data = await request.get_json(silent=True) or {}
         text = data.get('text', '')
         voice_id = data.get('voice_id', '21m00Tcm4TlvDq8ikWAM')
 
@@ -687,59 +1056,78 @@ def text_to_speech():
             }
         }
 
-        print(f"[TTS] Streaming {len(text)} chars, voice={voice_id}")
-
-        el_resp = requests.post(url, headers=headers, json=payload,
-                                stream=True, timeout=30)
-
-        if el_resp.status_code != 200:
-            err = el_resp.text
-            print(f"[TTS] ElevenLabs error {el_resp.status_code}: {err}")
-            try:
-                detail = el_resp.json().get('detail', {})
-                err = detail.get('message', err) if isinstance(detail, dict) else detail
-            except Exception:
-                pass
-            return jsonify({'error': f'ElevenLabs error ({el_resp.status_code}): {err}'}), el_resp.status_code
-
-        def generate():
-            for chunk in el_resp.iter_content(chunk_size=4096):
-                if chunk:
-                    yield chunk
-
-        return Response(stream_with_context(generate()), content_type='audio/mpeg')
-
-    except requests.exceptions.Timeout:
+        logger.info("[TTS] Streaming %d chars, voice=%s", len(text), voice_id)
+
+        # The ElevenLabs slot is held until the stream to the client finishes.
+        # No total timeout: the body is streamed to the client as it arrives.
+        # Synthesis is billed per character, so it is not idempotent.
+        stream_ctx = contextlib.AsyncExitStack()
+        el_resp = await stream_ctx.enter_async_context(upstream_request(
+            _elevenlabs_sem, 'POST', url, idempotent=False, headers=headers, json=payload,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+        ))
+
+        if el_resp.status != 200:
+            async with stream_ctx:
+                err = await el_resp.text()
+                logger.error("[TTS] ElevenLabs error %s: %s", el_resp.status, err)
+                try:
+                    detail = (await el_resp.json(content_type=None, loads=orjson.loads)).get('detail', {})
+                    err = detail.get('message', err) if isinstance(detail, dict) else detail
+                except (ValueError, AttributeError):
+                    pass
+            return jsonify({'error': f'ElevenLabs error ({el_resp.status}): {err}'}), el_resp.status
+
+        # Forward each buffer as soon as it arrives rather than re-slicing it into
+        # fixed 4 KB chunks, so there are fewer Python iterations per second of audio
+        chunks = el_resp.content.iter_any().__aiter__()
+        response = Response(ClosingStream(chunks, stream_ctx), content_type='audio/mpeg')
+        # Quart would otherwise cut the body off after RESPONSE_TIMEOUT (60s)
+        response.timeout = None
+        return response
+
+    except asyncio.TimeoutError:
         return jsonify({'error': 'ElevenLabs timeout'}), 504
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         return jsonify({'error': 'Unable to connect to ElevenLabs'}), 503
-    except Exception as e:
-        print(f"[TTS] Error: {str(e)}")
-        return jsonify({'error': f'TTS error: {str(e)}'}), 500
+
+
+def decode_to_wav(audio_data, rate=16000):
+    """Decode an uploaded recording (webm/opus etc.) to mono 16-bit PCM WAV bytes."""
+    wav = io.BytesIO()
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=rate)
+    # Frames are appended to the WAV body as they are decoded; the header's
+    # sizes are patched in when the writer closes.
+    with av.open(io.BytesIO(audio_data)) as container, wave.open(wav, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                wav_file.writeframesraw(bytes(out.planes[0])[:out.samples * 2])
+        # Flush samples still buffered inside the resampler
+        for out in resampler.resample(None):
+            wav_file.writeframesraw(bytes(out.planes[0])[:out.samples * 2])
+    return wav.getvalue()
 
 
 @app.route('/api/stt', methods=['POST'])
-def speech_to_text():
+async def speech_to_text():
     """Convert speech to text using Azure Speech-to-Text"""
-    webm_path = None
-    wav_path = None
     try:
-        if 'audio' not in request.files:
+        files = await request.files
+        if 'audio' not in files:
             return jsonify({'error': 'Audio file is required'}), 400
 
-        audio_file = request.files['audio']
-
-        # Save the uploaded webm file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp:
-            audio_file.save(tmp.name)
-            webm_path = tmp.name
+        audio_data = files['audio'].read()
 
-        # Convert webm → 16-kHz mono WAV (required by Azure STT REST API)
-        wav_path = webm_path.replace('.webm', '.wav')
-        subprocess.run(
-            ['ffmpeg', '-y', '-i', webm_path, '-ar', '16000', '-ac', '1', wav_path],
-            check=True, capture_output=True
-        )
+        # Convert webm → 16-kHz mono WAV (required by Azure STT REST API).
+        # Decoding is CPU work, so it runs off the event loop.
+        try:
+            wav_data = await asyncio.to_thread(decode_to_wav, audio_data)
+        except av.FFmpegError as e:
+            logger.warning("[Azure STT] Decode error: %s", e)
+            return jsonify({'error': 'Audio conversion failed'}), 500
 
         # Call Azure STT REST API
         stt_url = (
@@ -752,286 +1140,488 @@ def speech_to_text():
         }
         params = {'language': 'en-US', 'format': 'simple'}
 
-        with open(wav_path, 'rb') as wav_file:
-            response = requests.post(stt_url, headers=headers, params=params, data=wav_file, timeout=15)
+        async with _http_session.post(stt_url, headers=headers, params=params, data=wav_data,
+                                      timeout=aiohttp.ClientTimeout(total=15)) as response:
+            status = response.status
+            body = await response.text()
 
-        print(f"[Azure STT] Status: {response.status_code}")
+        logger.debug("[Azure STT] Status: %s", status)
 
-        if response.status_code != 200:
-            print(f"[Azure STT] Error: {response.text}")
-            return jsonify({'error': f'Azure STT error ({response.status_code}): {response.text}'}), response.status_code
+        if status != 200:
+            logger.error("[Azure STT] Error: %s", body)
+            return jsonify({'error': f'Azure STT error ({status}): {body}'}), status
 
-        result = response.json()
+        result = orjson.loads(body)
         recognition_status = result.get('RecognitionStatus', '')
         transcript = result.get('DisplayText', '').strip()
 
-        print(f"[Azure STT] Status: {recognition_status} | Text: {transcript}")
+        logger.debug("[Azure STT] Status: %s | Text: %s", recognition_status, transcript)
 
         if recognition_status != 'Success' or not transcript:
             return jsonify({'error': f'Recognition failed: {recognition_status}'}), 422
 
         return jsonify({'success': True, 'text': transcript})
 
-    except subprocess.CalledProcessError as e:
-        print(f"[Azure STT] ffmpeg error: {e.stderr.decode()}")
-        return jsonify({'error': 'Audio conversion failed'}), 500
-    except Exception as e:
-        print(f"[Azure STT] Error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-    finally:
-        for path in [webm_path, wav_path]:
-            if path and os.path.exists(path):
-                os.unlink(path)
+    except asyncio.TimeoutError:
+        return jsonify({'error': 'Azure STT timeout'}), 504
+    except aiohttp.ClientConnectionError:
+        return jsonify({'error': 'Unable to connect to Azure STT'}), 503
+
+
+class RevinciAuthError(Exception):
+    """Keycloak did not issue a Revinci token."""
+
+
+def _fail_revinci_token(reason):
+    """Start the failure backoff and return the error for the caller to raise."""
+    _revinci_token_cache['retry_at'] = time.time() + REVINCI_CONFIG['token_failure_backoff']
+    logger.error("[Revinci] Token fetch failed: %s", reason)
+    return RevinciAuthError(reason)
+
 
+async def get_revinci_token():
+    """Return a valid Keycloak bearer token, refreshing if expired.
 
-def get_revinci_token():
-    """Return a valid Keycloak bearer token, refreshing if expired."""
-    now = time.time()
-    # Refresh if token is missing or expires within 60 seconds
-    if _revinci_token_cache['token'] and _revinci_token_cache['expires_at'] - now > 60:
+    Raises RevinciAuthError if Keycloak fails; further calls fail fast until
+    ``token_failure_backoff`` has passed.
+    """
+    # expires_at already has the refresh skew subtracted, see below
+    if _revinci_token_cache['token'] and _revinci_token_cache['expires_at'] > time.time():
         return _revinci_token_cache['token']
 
-    token_url = (
-        f"{REVINCI_CONFIG['keycloak_url']}"
-        f"/realms/{REVINCI_CONFIG['keycloak_realm']}"
-        f"/protocol/openid-connect/token"
-    )
-    data = {
-        'grant_type': 'password',
-        'client_id': REVINCI_CONFIG['keycloak_client_id'],
-        'username': REVINCI_CONFIG['auth_username'],
-        'password': REVINCI_CONFIG['auth_password'],
-    }
-    print(f"[Revinci] Fetching new token from {token_url}")
-    print(f"[Revinci] Token request data: {data}")
-    resp = requests.post(token_url, data=data, timeout=15, verify=REVINCI_SSL_VERIFY)
-    print(f"[Revinci] Token response status: {resp.status_code}")
-    print(f"[Revinci] Token response body: {resp.text}")
-    resp.raise_for_status()
-    token_data = resp.json()
-    _revinci_token_cache['token'] = token_data['access_token']
-    _revinci_token_cache['expires_at'] = now + token_data.get('expires_in', 300)
-    print(f"[Revinci] Token refreshed, expires in {token_data.get('expires_in', 300)}s")
-    return _revinci_token_cache['token']
-
-
-def call_revinci_api(user_input, conversation_id=''):
-    try:
-        token = get_revinci_token()
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f"Bearer {token}",
-            'tenant-id': 'tessla'
+    async with _revinci_token_lock:
+        # Another request may have refreshed the token while we waited for the lock
+        if _revinci_token_cache['token'] and _revinci_token_cache['expires_at'] > time.time():
+            return _revinci_token_cache['token']
+        if _revinci_token_cache['retry_at'] > time.time():
+            raise RevinciAuthError('Token fetch failed recently, not retrying yet')
+
+        token_url = (
+            f"{REVINCI_CONFIG['keycloak_url']}"
+            f"/realms/{REVINCI_CONFIG['keycloak_realm']}"
+            f"/protocol/openid-connect/token"
+        )
+        data = {
+            'grant_type': 'password',
+            'client_id': REVINCI_CONFIG['keycloak_client_id'],
+            'username': REVINCI_CONFIG['auth_username'],
+            'password': REVINCI_CONFIG['auth_password'],
         }
+        logger.info("[Revinci] Fetching new token from %s", token_url)
+        # Token grants are safe to repeat, so transient Keycloak errors are retried
+        try:
+            resp = await send_with_retry(_revinci_session, 'POST', token_url, data=data,
+                                         timeout=aiohttp.ClientTimeout(total=15))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _fail_revinci_token(f"{type(e).__name__}: {e}") from e
+        async with resp:
+            logger.debug("[Revinci] Token response status: %s", resp.status)
+            try:
+                token_data = await resp.json(content_type=None, loads=orjson.loads)
+            except ValueError:
+                token_data = None
+        if not isinstance(token_data, dict):
+            raise _fail_revinci_token(f"status {resp.status}, body is not a JSON object")
+        if resp.status != 200:
+            # Keycloak's error fields describe the failure without echoing credentials
+            error = token_data.get('error_description') or token_data.get('error')
+            raise _fail_revinci_token(f"status {resp.status}: {error}")
+        token = token_data.get('access_token')
+        if not token:
+            raise _fail_revinci_token("response has no access_token")
+
+        expires_in = int(token_data.get('expires_in', 300))
+        _revinci_token_cache['token'] = token
+        _revinci_token_cache['expires_at'] = time.time() + expires_in - REVINCI_CONFIG['token_refresh_skew']
+        logger.info("[Revinci] Token refreshed, expires in %ss", expires_in)
+        return token
+
+
+async def _revinci_events(response):
+    """Parse a Revinci text/event-stream body into one dict per event."""
+    data = []
+    async for line in response.content:
+        line = line.rstrip(b'\r\n')
+        if line.startswith(b'data:'):
+            # Per the SSE spec only one space after the colon is syntax; the rest
+            # may be part of a token (' world')
+            value = line[5:]
+            data.append(value[1:] if value.startswith(b' ') else value)
+            continue
+        if line or not data:
+            continue
+        payload, data = b'\n'.join(data), []
+        if payload == b'[DONE]':
+            return
+        try:
+            event = orjson.loads(payload)
+        except ValueError:
+            event = payload.decode()
+        if isinstance(event, str):
+            event = {'content': event}
+        if isinstance(event, dict):
+            yield event
+
+
+async def call_revinci_api(user_input, conversation_id='', stream=False):
+    """Send one chat turn to Revinci.
+
+    With ``stream=True`` an SSE reply is returned as ``{'success': True, 'events': ...}``,
+    an async iterator of event dicts that keeps the upstream response open until it is
+    exhausted or closed. Backends that still answer with JSON get the usual result.
+    """
+    try:
+        token = await get_revinci_token()
+        headers = {**_REVINCI_BASE_HEADERS, 'Authorization': f"Bearer {token}"}
         payload = {
             'user_id': REVINCI_CONFIG['user_id'],
             'user_input': user_input,
             'conversation_id': conversation_id
         }
-        print(f"[Revinci] POST {REVINCI_CONFIG['url']}")
-        response = requests.post(REVINCI_CONFIG['url'], headers=headers, json=payload, timeout=30, verify=REVINCI_SSL_VERIFY)
-        print(f"[Revinci] Status: {response.status_code}")
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'success': True,
-                'content': data.get('content', ''),
-                'conversation_id': data.get('conversation_id', '')
-            }
-        else:
-            print(f"[Revinci] Error {response.status_code}: {response.text}")
-            return {'success': False, 'error': f"Status {response.status_code}"}
+        kwargs = {}
+        if stream:
+            headers['Accept'] = 'text/event-stream'
+            # Generation can outlast the session's 30s total; only bound the gaps
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+        logger.debug("[Revinci] POST %s", REVINCI_CONFIG['url'])
+        stream_ctx = contextlib.AsyncExitStack()
+        response = await stream_ctx.enter_async_context(
+            _revinci_session.post(REVINCI_CONFIG['url'], headers=headers, json=payload, **kwargs)
+        )
+        if stream and response.status == 200 and response.content_type == 'text/event-stream':
+            events = _revinci_events(response).__aiter__()
+            return {'success': True, 'events': ClosingStream(events, stream_ctx)}
+        async with stream_ctx:
+            logger.debug("[Revinci] Status: %s", response.status)
+            if response.status == 200:
+                data = await response.json(loads=orjson.loads)
+                return {
+                    'success': True,
+                    'content': data.get('content', ''),
+                    'conversation_id': data.get('conversation_id', '')
+                }
+            else:
+                logger.error("[Revinci] Error %s: %s", response.status, await response.text())
+                return {'success': False, 'error': f"Status {response.status}"}
+    except RevinciAuthError as e:
+        # Already logged when the token fetch failed
+        return {'success': False, 'error': str(e)}
     except Exception as e:
-        print(f"[Revinci] Exception: {str(e)}")
+        logger.error("[Revinci] Exception: %s", e, exc_info=True)
         return {'success': False, 'error': str(e)}
 
 
-@app.route('/api/chat', methods=['POST'])
-@app.route('/api/opportunity', methods=['POST'])
-def chat():
+async def get_revinci_conversation_id(session_id):
+    # With Redis every worker sees the same mapping, so it is the only source of truth
+    if _redis is None:
+        return revinci_conversation_ids.get(session_id, '')
     try:
-        data = request.json
-        message = data.get('message') or data.get('user_input', '')
-        session_id = data.get('session_id') or data.get('conversation_id', 'default')
+        return await _redis.get(f"revinci:{session_id}") or ''
+    except redis.RedisError as e:
+        logger.warning("[Session] GET %s failed: %s", session_id, e)
+        return ''
 
-        if not message:
-            return jsonify({'error': 'Message is required'}), 400
 
-        revinci_conv_id = revinci_conversation_ids.get(session_id, '')
-        revinci_result = call_revinci_api(message, revinci_conv_id)
+async def set_revinci_conversation_id(session_id, conversation_id):
+    if _redis is None:
+        revinci_conversation_ids[session_id] = conversation_id
+        return
+    try:
+        await _redis.set(f"revinci:{session_id}", conversation_id, ex=SESSION_CONFIG['ttl'])
+    except redis.RedisError as e:
+        logger.warning("[Session] SET %s failed: %s", session_id, e)
 
-        if revinci_result['success']:
-            assistant_message = revinci_result['content']
-            revinci_conversation_ids[session_id] = revinci_result['conversation_id']
-        else:
-            print(f"Revinci API error: {revinci_result.get('error')}")
-            return jsonify({'error': 'Failed to get a response. Please try again.'}), 502
 
-        return jsonify({
-            'response': assistant_message,
-            'session_id': session_id
-        })
+async def clear_revinci_conversation_id(session_id):
+    if _redis is None:
+        revinci_conversation_ids.pop(session_id, None)
+        return
+    try:
+        await _redis.delete(f"revinci:{session_id}")
+    except redis.RedisError as e:
+        logger.warning("[Session] DEL %s failed: %s", session_id, e)
+
+
+async def _relay_chat_events(events, session_id):
+    """Re-emit Revinci's events to the browser as SSE, one message per text chunk."""
+    conversation_id = ''
+    try:
+        async for event in events:
+            # Saved as soon as it is known, so a client that disconnects
+            # mid-answer still continues the same Revinci thread next turn
+            if event.get('conversation_id') and event['conversation_id'] != conversation_id:
+                conversation_id = event['conversation_id']
+                await set_revinci_conversation_id(session_id, conversation_id)
+            if event.get('content'):
+                yield b'data: ' + orjson.dumps({'response': event['content']}) + b'\n\n'
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        # Tell the client the answer is incomplete rather than just ending the stream
+        logger.warning("[Revinci] Stream interrupted: %s", e)
+        yield b'event: error\ndata: ' + orjson.dumps({'error': 'The response was interrupted.'}) + b'\n\n'
+        return
+    finally:
+        await events.aclose()
+    yield b'event: done\ndata: ' + orjson.dumps({'session_id': session_id}) + b'\n\n'
+
+
+async def _chat_impl(stream=False):
+    if json_body_too_large():
+        return jsonify({'error': 'Request body too large'}), 413
+    data = await request.get_json(silent=True) or {}
+    message = data.get('message') or data.get('user_input', '')
+    session_id = data.get('session_id') or data.get('conversation_id', 'default')
+
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    revinci_conv_id = await get_revinci_conversation_id(session_id)
+    stream = stream and 'text/event-stream' in request.headers.get('Accept', '')
+    revinci_result = await call_revinci_api(message, revinci_conv_id, stream=stream)
+
+    if revinci_result['success'] and 'events' in revinci_result:
+        events = revinci_result['events']
+        # A generator that never started skips its finally, so also tie the
+        # upstream response to the body in case the client leaves before the first chunk
+        stream_ctx = contextlib.AsyncExitStack()
+        stream_ctx.push_async_callback(events.aclose)
+        relay = _relay_chat_events(events, session_id).__aiter__()
+        response = Response(ClosingStream(relay, stream_ctx), content_type='text/event-stream')
+        # Quart cuts bodies off after RESPONSE_TIMEOUT (60s); the upstream read
+        # timeout already bounds a stalled generation
+        response.timeout = None
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    if revinci_result['success']:
+        assistant_message = revinci_result['content']
+        await set_revinci_conversation_id(session_id, revinci_result['conversation_id'])
+    else:
+        logger.error("Revinci API error: %s", revinci_result.get('error'))
+        return jsonify({'error': 'Failed to get a response. Please try again.'}), 502
+
+    return jsonify({
+        'response': assistant_message,
+        'session_id': session_id
+    })
+
+
+@app.route('/api/chat', methods=['POST'], endpoint='chat')
+async def chat():
+    # Streams the answer when the client sends Accept: text/event-stream
+    return await _chat_impl(stream=True)
+
+
+@app.route('/api/opportunity', methods=['POST'], endpoint='opportunity')
+async def opportunity():
+    return await _chat_impl()
 
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+
+# Longest free-text query parameters forwarded upstream
+ARG_LIMITS = {
+    'city': 100,
+    'query': 200
+}
+
+# Letters (any script), digits, spaces and the punctuation real place names use
+_CITY_ARG_RE = re.compile(r"[\w .,'-]+")
+
+
+def text_arg(name, max_length):
+    """Stripped string query parameter, cut to ``max_length`` ('' when absent)."""
+    return (request.args.get(name) or '').strip()[:max_length]
+
+
+def int_arg(name, default):
+    """Integer query parameter: ``default`` when absent, None when not a number."""
+    if name not in request.args:
+        return default
+    # Werkzeug returns the default (here None) instead of raising on a bad value
+    return request.args.get(name, type=int)
 
 
 @app.route('/api/weather', methods=['GET'])
-def get_weather():
-    try:
-        city = request.args.get('city')
-        
-        if not city:
-            return jsonify({'error': 'City parameter is required'}), 400
-        
-        weather_data = get_weather_data(city)
-        
-        if weather_data['success']:
-            return jsonify(weather_data['data'])
-        else:
-            return jsonify({'error': weather_data['error']}), 404
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+async def get_weather():
+    city = text_arg('city', ARG_LIMITS['city'])
+
+    if not city:
+        return jsonify({'error': 'City parameter is required'}), 400
+
+    if not _CITY_ARG_RE.fullmatch(city):
+        return jsonify({'error': 'Invalid city'}), 400
+
+    weather_data = await get_weather_data(city)
+
+    if weather_data['success']:
+        return cacheable(jsonify(weather_data['data']), CACHE_CONFIG['ttl']['weather'],
+                         weather_data.get('stale', False))
+    else:
+        return jsonify({'error': weather_data['error']}), 404
 
 
 @app.route('/api/forecast', methods=['GET'])
-def get_forecast():
-    try:
-        city = request.args.get('city')
-        days = int(request.args.get('days', 5))
-        
-        if not city:
-            return jsonify({'error': 'City parameter is required'}), 400
-        
-        if days < 1 or days > 5:
-            return jsonify({'error': 'Days must be between 1 and 5'}), 400
-        
-        forecast_data = get_weather_forecast(city, days)
-        
-        if forecast_data['success']:
-            return jsonify(forecast_data)
-        else:
-            return jsonify({'error': forecast_data['error']}), 404
-            
-    except ValueError:
+async def get_forecast():
+    city = text_arg('city', ARG_LIMITS['city'])
+    days = int_arg('days', 5)
+
+    if not city:
+        return jsonify({'error': 'City parameter is required'}), 400
+
+    if not _CITY_ARG_RE.fullmatch(city):
+        return jsonify({'error': 'Invalid city'}), 400
+
+    if days is None:
         return jsonify({'error': 'Days parameter must be a number'}), 400
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+
+    if days < 1 or days > 5:
+        return jsonify({'error': 'Days must be between 1 and 5'}), 400
+
+    forecast_data = await get_weather_forecast(city, days)
+
+    if forecast_data['success']:
+        return cacheable(jsonify(forecast_data), CACHE_CONFIG['ttl']['forecast'],
+                         forecast_data.get('stale', False))
+    else:
+        return jsonify({'error': forecast_data['error']}), 404
 
 
 @app.route('/api/wikipedia', methods=['GET'])
-def get_wikipedia():
-    try:
-        query = request.args.get('query')
-        sentences = int(request.args.get('sentences', 3))
-        
-        if not query:
-            return jsonify({'error': 'Query parameter is required'}), 400
-        
-        if sentences < 1 or sentences > 10:
-            return jsonify({'error': 'Sentences must be between 1 and 10'}), 400
-        
-        wiki_data = search_wikipedia(query, sentences)
-        
-        if wiki_data['success']:
-            return jsonify(wiki_data['data'])
-        else:
-            return jsonify({'error': wiki_data['error']}), 404
-            
-    except ValueError:
+async def get_wikipedia():
+    query = text_arg('query', ARG_LIMITS['query'])
+    sentences = int_arg('sentences', 3)
+
+    if not query:
+        return jsonify({'error': 'Query parameter is required'}), 400
+
+    if sentences is None:
         return jsonify({'error': 'Sentences parameter must be a number'}), 400
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+
+    if sentences < 1 or sentences > 10:
+        return jsonify({'error': 'Sentences must be between 1 and 10'}), 400
+
+    wiki_data = await search_wikipedia(query, sentences)
+
+    if wiki_data['success']:
+        return cacheable(jsonify(wiki_data['data']), CACHE_CONFIG['ttl']['wikipedia'],
+                         wiki_data.get('stale', False))
+    else:
+        return jsonify({'error': wiki_data['error']}), 404
 
 
 @app.route('/api/news', methods=['GET'])
-def get_news():
-    try:
-        query = request.args.get('query')
-        category = request.args.get('category')
-        country = request.args.get('country', 'us')
-        page_size = int(request.args.get('page_size', 10))
-        
-        if page_size < 1 or page_size > 100:
-            return jsonify({'error': 'Page size must be between 1 and 100'}), 400
-        
-        news_data = get_general_news(query=query, category=category, country=country, page_size=page_size)
-        
-        if news_data['success']:
-            return jsonify(news_data['data'])
-        else:
-            return jsonify({'error': news_data['error']}), 404
-            
-    except ValueError:
+async def get_news():
+    query = text_arg('query', ARG_LIMITS['query']) or None
+    category = request.args.get('category')
+    country = request.args.get('country', 'us')
+    page_size = int_arg('page_size', 10)
+
+    if page_size is None:
         return jsonify({'error': 'Page size must be a number'}), 400
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+
+    if page_size < 1 or page_size > 100:
+        return jsonify({'error': 'Page size must be between 1 and 100'}), 400
+
+    news_data = await get_general_news(query=query, category=category, country=country, page_size=page_size)
+
+    if news_data['success']:
+        ttl = CACHE_CONFIG['ttl']['news_query' if query else 'headlines']
+        return cacheable(jsonify(news_data['data']), ttl, news_data.get('stale', False))
+    else:
+        return jsonify({'error': news_data['error']}), 404
 
 
 @app.route('/api/financial-news', methods=['GET'])
-def get_financial_news_endpoint():
-    try:
-        query = request.args.get('query')
-        page_size = int(request.args.get('page_size', 10))
-        
-        if page_size < 1 or page_size > 100:
-            return jsonify({'error': 'Page size must be between 1 and 100'}), 400
-        
-        news_data = get_financial_news(query=query, page_size=page_size)
-        
-        if news_data['success']:
-            return jsonify(news_data['data'])
-        else:
-            return jsonify({'error': news_data['error']}), 404
-            
-    except ValueError:
+async def get_financial_news_endpoint():
+    query = text_arg('query', ARG_LIMITS['query']) or None
+    page_size = int_arg('page_size', 10)
+
+    if page_size is None:
         return jsonify({'error': 'Page size must be a number'}), 400
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+
+    if page_size < 1 or page_size > 100:
+        return jsonify({'error': 'Page size must be between 1 and 100'}), 400
+
+    news_data = await get_financial_news(query=query, page_size=page_size)
+
+    if news_data['success']:
+        return cacheable(jsonify(news_data['data']), CACHE_CONFIG['ttl']['news_query'],
+                         news_data.get('stale', False))
+    else:
+        return jsonify({'error': news_data['error']}), 404
+
+
+@app.route('/api/bundle', methods=['GET'])
+async def get_bundle():
+    """Weather, news and Wikipedia in one round-trip; the upstream calls overlap."""
+    sections = {}
+    city = text_arg('city', ARG_LIMITS['city'])
+    news_query = text_arg('news_query', ARG_LIMITS['query'])
+    wiki_query = text_arg('wiki_query', ARG_LIMITS['query'])
+
+    if city and not _CITY_ARG_RE.fullmatch(city):
+        return jsonify({'error': 'Invalid city'}), 400
+
+    if city:
+        sections['weather'] = get_weather_data(city)
+    if news_query:
+        sections['news'] = get_general_news(query=news_query)
+    if wiki_query:
+        sections['wikipedia'] = search_wikipedia(wiki_query, 3)
+
+    if not sections:
+        return jsonify({'error': 'At least one of city, news_query or wiki_query is required'}), 400
+
+    results = await asyncio.gather(*sections.values(), return_exceptions=True)
+
+    bundle = {}
+    for name, result in zip(sections, results):
+        if isinstance(result, Exception):
+            bundle[name] = {'error': str(result)}
+        elif result['success']:
+            bundle[name] = result['data']
+        else:
+            bundle[name] = {'error': result['error']}
+    return jsonify(bundle)
+
+
+def _fresh_session():
+    """A new message history holding only the system prompt."""
+    return [{'role': 'system', 'content': SYSTEM_PROMPT}]
 
 
 @app.route('/api/clear', methods=['POST'])
-def clear_conversation():
-    try:
-        data = request.json
-        session_id = data.get('session_id', 'default')
-        
-        if session_id in conversation_sessions:
-            conversation_sessions[session_id] = [
-                {'role': 'system', 'content': SYSTEM_PROMPT}
-            ]
-        
-        return jsonify({'message': 'Conversation cleared successfully'})
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+async def clear_conversation():
+    if json_body_too_large():
+        return jsonify({'error': 'Request body too large'}), 413
+    data = await request.get_json(silent=True) or {}
+    session_id = data.get('session_id', 'default')
+
+    if session_id in conversation_sessions:
+        conversation_sessions[session_id] = _fresh_session()
+    # Drop the Revinci thread too, otherwise the next message resumes it
+    await clear_revinci_conversation_id(session_id)
+
+    return jsonify({'message': 'Conversation cleared successfully'})
+
+
+# Configuration is fixed at import, so only the session count varies per probe
+_HEALTH = {
+    'status': 'healthy',
+    'service': 'Conversational AI Assistant',
+    'azure_openai': 'configured',
+    'weather_api': 'configured' if WEATHER_CONFIG['api_key'] else 'not configured',
+    'wikipedia_api': 'available',
+    'news_api': 'configured' if NEWS_CONFIG['api_key'] else 'not configured',
+    'azure_stt': 'configured' if AZURE_SPEECH_CONFIG['api_key'] else 'not configured',
+    'elevenlabs_tts': 'configured',
+}
 
 
 @app.route('/api/health', methods=['GET'])
-def health_check():
-    weather_api_configured = WEATHER_CONFIG['api_key'] != 'YOUR_OPENWEATHERMAP_API_KEY'
-    news_api_configured = NEWS_CONFIG['api_key'] != 'YOUR_NEWSAPI_KEY'
-    
-    return jsonify({
-        'status': 'healthy',
-        'service': 'Conversational AI Assistant',
-        'azure_openai': 'configured',
-        'weather_api': 'configured' if weather_api_configured else 'not configured',
-        'wikipedia_api': 'available',
-        'news_api': 'configured' if news_api_configured else 'not configured',
-        'azure_stt': 'configured' if AZURE_SPEECH_CONFIG['api_key'] else 'not configured',
-        'elevenlabs_tts': 'configured',
-        'active_sessions': len(conversation_sessions)
-    })
+async def health_check():
+    return jsonify({**_HEALTH, 'active_sessions': len(conversation_sessions)})
 
 
 if __name__ == '__main__':
-    import os
-    
-    os.makedirs('templates', exist_ok=True)
-    
     print("\n" + "="*70)
     print("🚀 Conversational AI Assistant")
     print("   Weather | Wikipedia | News | Azure STT | ElevenLabs TTS")
@@ -1059,7 +1649,24 @@ if __name__ == '__main__':
         print("✅ Azure STT: Configured")
     print("✅ ElevenLabs TTS: Configured")
     
-    print("\n🌐 Server: https://localhost:5001")
+    ssl_certfile = os.getenv('SSL_CERTFILE')
+    ssl_keyfile = os.getenv('SSL_KEYFILE')
+    scheme = 'https' if ssl_certfile and ssl_keyfile else 'http'
+    development = os.getenv('APP_ENV') == 'development'
+    print(f"\n🌐 Server: {scheme}://localhost:5001")
+    print(f"   Mode: {'development (debug, reloader)' if development else 'production (hypercorn.toml)'}")
     print("="*70 + "\n")
 
-    app.run(host='0.0.0.0', port=5001, debug=True, ssl_context='adhoc')
+    if development:
+        app.run(host='0.0.0.0', port=5001, debug=True,
+                certfile=ssl_certfile, keyfile=ssl_keyfile)
+    else:
+        # Same settings as `hypercorn --config hypercorn.toml app:app`
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config.from_toml(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hypercorn.toml'))
+        if ssl_certfile and ssl_keyfile:
+            config.certfile = ssl_certfile
+            config.keyfile = ssl_keyfile
+        asyncio.run(serve(app, config))